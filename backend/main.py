@@ -1,15 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator
+import asyncio
 import os
 
+import orjson
+
 from services.ai_client import AIClient
 from services.prompt_engine import PromptEngine
 from services.context_aggregator import ContextAggregator
 from services.character_extractor import CharacterExtractor
 
-app = FastAPI(title="Writing Dashboard Backend")
+app = FastAPI(title="Writing Dashboard Backend", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,22 +24,41 @@ app.add_middleware(
 )
 
 # Initialize services
+# PromptEngine and CharacterExtractor are stateless; their methods are called on the class
 ai_client = AIClient()
-prompt_engine = PromptEngine()
 context_aggregator = ContextAggregator()
-character_extractor = CharacterExtractor()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await ai_client.aclose()
 
 class GenerateRequest(BaseModel):
     mode: str
     selectedText: Optional[str] = None
     directorNotes: Optional[str] = None
     wordCount: Optional[int] = 2000
+    stream: Optional[bool] = False
+    # Skip the response cache to get a fresh take on an unchanged prompt
+    regenerate: Optional[bool] = False
     settings: Dict
 
 class ExtractRequest(BaseModel):
     selectedText: str
+    regenerate: Optional[bool] = False
     settings: Dict
 
+async def _sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """Frame text chunks as server-sent events (JSON-encoded so newlines survive)"""
+    try:
+        async for chunk in chunks:
+            if chunk:
+                yield b"data: " + orjson.dumps({'text': chunk}) + b"\n\n"
+    except Exception as e:
+        # Headers are already sent, so report failures in-band
+        yield b"event: error\ndata: " + orjson.dumps({'detail': str(e)}) + b"\n\n"
+        return
+    yield b"event: done\ndata: {}\n\n"
+
 @app.post("/api/generate/chapter")
 async def generate_chapter(request: GenerateRequest):
     try:
@@ -48,19 +71,35 @@ async def generate_chapter(request: GenerateRequest):
             book2_path=request.settings['book2Path']
         )
         
-        # Build prompt
-        prompt = prompt_engine.build_chapter_prompt(
+        # Build prompt (off the event loop; Book 2 alone can be megabytes)
+        prompt_parts = await asyncio.to_thread(
+            PromptEngine.build_chapter_prompt,
             context=context,
             instructions=request.directorNotes or "",
             word_count=request.wordCount
         )
         
+        # Stream tokens as they arrive when requested
+        if request.stream:
+            return StreamingResponse(
+                _sse_events(ai_client.stream(
+                    system=prompt_parts.system,
+                    prompt=prompt_parts.user,
+                    api_key=request.settings['apiKey'],
+                    provider=request.settings['apiProvider'],
+                    model=request.settings['model']
+                )),
+                media_type="text/event-stream"
+            )
+        
         # Generate
         result = await ai_client.generate(
-            prompt=prompt,
+            system=prompt_parts.system,
+            prompt=prompt_parts.user,
             api_key=request.settings['apiKey'],
             provider=request.settings['apiProvider'],
-            model=request.settings['model']
+            model=request.settings['model'],
+            use_cache=not request.regenerate
         )
         
         return {"text": result}
@@ -84,18 +123,34 @@ async def generate_micro_edit(request: GenerateRequest):
         )
         
         # Build prompt
-        prompt = prompt_engine.build_micro_edit_prompt(
+        prompt_parts = await asyncio.to_thread(
+            PromptEngine.build_micro_edit_prompt,
             selected_text=request.selectedText,
             director_notes=request.directorNotes or "",
             context=context
         )
         
+        # Stream tokens as they arrive when requested
+        if request.stream:
+            return StreamingResponse(
+                _sse_events(ai_client.stream(
+                    system=prompt_parts.system,
+                    prompt=prompt_parts.user,
+                    api_key=request.settings['apiKey'],
+                    provider=request.settings['apiProvider'],
+                    model=request.settings['model']
+                )),
+                media_type="text/event-stream"
+            )
+        
         # Generate
         result = await ai_client.generate(
-            prompt=prompt,
+            system=prompt_parts.system,
+            prompt=prompt_parts.user,
             api_key=request.settings['apiKey'],
             provider=request.settings['apiProvider'],
-            model=request.settings['model']
+            model=request.settings['model'],
+            use_cache=not request.regenerate
         )
         
         return {"text": result}
@@ -117,22 +172,26 @@ async def extract_characters(request: ExtractRequest):
         story_bible = await context_aggregator._read_file(vault / request.settings['storyBiblePath'])
         
         # Build extraction prompt
-        prompt = prompt_engine.build_character_extraction_prompt(
+        character_notes_text = await context_aggregator._format_character_notes(character_notes)
+        prompt_parts = await asyncio.to_thread(
+            PromptEngine.build_character_extraction_prompt,
             selected_text=request.selectedText,
-            character_notes=character_notes,
+            character_notes_text=character_notes_text,
             story_bible=story_bible
         )
         
         # Extract
         extraction_result = await ai_client.generate(
-            prompt=prompt,
+            system=prompt_parts.system,
+            prompt=prompt_parts.user,
             api_key=request.settings['apiKey'],
             provider=request.settings['apiProvider'],
-            model=request.settings['model']
+            model=request.settings['model'],
+            use_cache=not request.regenerate
         )
         
         # Parse extraction into character updates
-        updates = character_extractor.parse_extraction(extraction_result)
+        updates = await asyncio.to_thread(CharacterExtractor.parse_extraction, extraction_result)
         
         return {"updates": updates}
     except Exception as e:
@@ -1,59 +1,199 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+import httpx
 import openai
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 import google.generativeai as genai
-from typing import Optional
+from typing import Optional, Dict, Tuple, Any, Callable, AsyncIterator, Sequence
+
+DEFAULT_SYSTEM_PROMPT = "You are a professional writing assistant."
+
+# Completed generations keyed by a hash of everything that shapes the request
+RESPONSE_CACHE_MAX_ENTRIES = 128
+
+def _response_cache_key(provider: str, api_key: str, model: str, max_tokens: Optional[int], system: Sequence[str], prompt: str) -> bytes:
+    # The key is hashed in so a cached answer is never served to a different (or revoked) key
+    digest = hashlib.blake2b(digest_size=32)
+    for part in (provider, api_key, model, str(max_tokens or ''), *system, prompt):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.digest()
 
 class AIClient:
+    def __init__(self):
+        # Provider clients keyed by (provider, api_key) so their connection
+        # pools survive across requests instead of re-handshaking every call
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._gemini_api_key: Optional[str] = None
+        # One tuned pool shared by every OpenAI/Anthropic client so fan-out
+        # from the plugin isn't capped by httpx's default 100 connections.
+        # The SDKs adopt this timeout in place of their own 600s default, and a
+        # non-streamed generation sends nothing until it is complete, so keep
+        # the read timeout just as long; only connecting fails fast.
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=512, max_keepalive_connections=256),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+            http2=True
+        )
+        self._resp_cache: "OrderedDict[bytes, str]" = OrderedDict()
+        # Generations currently in flight, so identical concurrent requests share one provider call
+        self._inflight: Dict[bytes, "asyncio.Task[str]"] = {}
+
     async def generate(
         self,
         prompt: str,
         api_key: str,
         provider: str,
         model: str,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        system: Sequence[str] = (),
+        use_cache: bool = True
     ) -> str:
+        """
+        Generate a completion. `system` holds the stable part of the prompt
+        (instructions + slow-changing context) as blocks ordered most to least
+        stable; each block ends a provider cache prefix. `prompt` holds the
+        per-request remainder. Identical requests are served
+        from an in-process LRU instead of calling the provider again, and
+        concurrent identical requests wait on the same in-flight call. Pass
+        use_cache=False to force a fresh generation (e.g. asking for another take);
+        its result still replaces the cached one.
+        """
+        key = _response_cache_key(provider, api_key, model, max_tokens, system, prompt)
+        if not use_cache:
+            # The previous entry survives a failed regenerate; it's only replaced on success below
+            result = await self._generate(system, prompt, api_key, provider, model, max_tokens)
+            self._resp_cache.pop(key, None)
+        else:
+            result = self._resp_cache.pop(key, None)
+            if result is None:
+                task = self._inflight.get(key)
+                if task is None:
+                    task = asyncio.ensure_future(self._generate(system, prompt, api_key, provider, model, max_tokens))
+                    self._inflight[key] = task
+                    task.add_done_callback(lambda _: self._inflight.pop(key, None))
+                # Shielded so one caller disconnecting doesn't cancel the call for the others
+                result = await asyncio.shield(task)
+        self._resp_cache[key] = result
+        if len(self._resp_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            self._resp_cache.popitem(last=False)
+        return result
+    
+    async def _generate(self, system: Sequence[str], prompt: str, api_key: str, provider: str, model: str, max_tokens: Optional[int]) -> str:
         if provider == 'openai':
-            return await self._generate_openai(prompt, api_key, model, max_tokens)
+            return await self._generate_openai(system, prompt, api_key, model, max_tokens)
         elif provider == 'anthropic':
-            return await self._generate_anthropic(prompt, api_key, model, max_tokens)
+            return await self._generate_anthropic(system, prompt, api_key, model, max_tokens)
         elif provider == 'gemini':
-            return await self._generate_gemini(prompt, api_key, model, max_tokens)
+            return await self._generate_gemini(system, prompt, api_key, model, max_tokens)
         else:
             raise ValueError(f"Unsupported provider: {provider}")
     
-    async def _generate_openai(self, prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> str:
-        client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
+    async def stream(
+        self,
+        prompt: str,
+        api_key: str,
+        provider: str,
+        model: str,
+        max_tokens: Optional[int] = None,
+        system: Sequence[str] = ()
+    ) -> AsyncIterator[str]:
+        """Like generate(), but yields text chunks as the provider produces them"""
+        if provider == 'openai':
+            chunks = self._stream_openai(system, prompt, api_key, model, max_tokens)
+        elif provider == 'anthropic':
+            chunks = self._stream_anthropic(system, prompt, api_key, model, max_tokens)
+        elif provider == 'gemini':
+            chunks = self._stream_gemini(system, prompt, api_key, model, max_tokens)
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+        async for chunk in chunks:
+            yield chunk
+    
+    async def aclose(self) -> None:
+        await self._http.aclose()
+        self._clients.clear()
+    
+    def _get_client(self, provider: str, api_key: str, factory: Callable[[], Any]) -> Any:
+        key = (provider, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients.setdefault(key, factory())
+        return client
+    
+    def _openai_request(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> Tuple[Any, Dict[str, Any]]:
+        client = self._get_client('openai', api_key, lambda: openai.AsyncOpenAI(api_key=api_key, http_client=self._http))
+        return client, dict(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a professional writing assistant."},
+                # OpenAI caches long prompt prefixes automatically
+                {"role": "system", "content": f"{DEFAULT_SYSTEM_PROMPT}\n\n{''.join(system)}" if system else DEFAULT_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=max_tokens or 4000,
             temperature=0.7
         )
+    
+    async def _generate_openai(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> str:
+        client, kwargs = self._openai_request(system, prompt, api_key, model, max_tokens)
+        response = await client.chat.completions.create(**kwargs)
         return response.choices[0].message.content
     
-    async def _generate_anthropic(self, prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> str:
-        client = Anthropic(api_key=api_key)
-        response = client.messages.create(
+    async def _stream_openai(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> AsyncIterator[str]:
+        client, kwargs = self._openai_request(system, prompt, api_key, model, max_tokens)
+        async for chunk in await client.chat.completions.create(**kwargs, stream=True):
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+    
+    def _anthropic_request(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> Tuple[Any, Dict[str, Any]]:
+        client = self._get_client('anthropic', api_key, lambda: AsyncAnthropic(api_key=api_key, http_client=self._http))
+        return client, dict(
             model=model,
             max_tokens=max_tokens or 4000,
+            # One breakpoint per block, so a change in a later block (e.g. Book 2)
+            # still reuses the cached instructions + story bible before it
+            system=[
+                {"type": "text", "text": block, "cache_control": {"type": "ephemeral"}}
+                for block in (system or [DEFAULT_SYSTEM_PROMPT]) if block
+            ],
             messages=[
                 {"role": "user", "content": prompt}
             ]
         )
+    
+    async def _generate_anthropic(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> str:
+        client, kwargs = self._anthropic_request(system, prompt, api_key, model, max_tokens)
+        response = await client.messages.create(**kwargs)
         return response.content[0].text
     
-    async def _generate_gemini(self, prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> str:
-        genai.configure(api_key=api_key)
-        model_instance = genai.GenerativeModel(model)
-        response = model_instance.generate_content(
-            prompt,
+    async def _stream_anthropic(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> AsyncIterator[str]:
+        client, kwargs = self._anthropic_request(system, prompt, api_key, model, max_tokens)
+        async with client.messages.stream(**kwargs) as stream:
+            async for text in stream.text_stream:
+                yield text
+    
+    def _gemini_request(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> Tuple[Any, Dict[str, Any]]:
+        # genai keeps one global client; only reconfigure it when the key changes
+        if self._gemini_api_key != api_key:
+            genai.configure(api_key=api_key)
+            self._gemini_api_key = api_key
+        model_instance = self._get_client(f'gemini:{model}', api_key, lambda: genai.GenerativeModel(model))
+        return model_instance, dict(
+            contents=f"{''.join(system)}\n\n{prompt}" if system else prompt,
             generation_config={
                 'max_output_tokens': max_tokens or 4000,
                 'temperature': 0.7
             }
         )
+    
+    async def _generate_gemini(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> str:
+        model_instance, kwargs = self._gemini_request(system, prompt, api_key, model, max_tokens)
+        response = await model_instance.generate_content_async(**kwargs)
         return response.text
-
+    
+    async def _stream_gemini(self, system: Sequence[str], prompt: str, api_key: str, model: str, max_tokens: Optional[int]) -> AsyncIterator[str]:
+        model_instance, kwargs = self._gemini_request(system, prompt, api_key, model, max_tokens)
+        async for chunk in await model_instance.generate_content_async(**kwargs, stream=True):
+            yield chunk.text
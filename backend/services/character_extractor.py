@@ -2,8 +2,13 @@ import re
 from typing import List, Dict
 from datetime import datetime
 
+_CHAR_SPLIT = re.compile(r'^##\s+(.+)$', re.MULTILINE)
+_UPDATE_HDR = re.compile(r'^###\s+.*?Update\s*\n', re.MULTILINE)
+_NAME_RE = re.compile(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b')
+
 class CharacterExtractor:
-    def parse_extraction(self, extraction_text: str) -> List[Dict[str, str]]:
+    @staticmethod
+    def parse_extraction(extraction_text: str) -> List[Dict[str, str]]:
         """
         Parse AI extraction output into structured character updates.
         Expected format:
@@ -14,7 +19,7 @@ class CharacterExtractor:
         updates = []
         
         # Split by character sections (## CharacterName)
-        character_sections = re.split(r'^##\s+(.+)$', extraction_text, flags=re.MULTILINE)
+        character_sections = _CHAR_SPLIT.split(extraction_text)
         
         for i in range(1, len(character_sections), 2):
             if i + 1 < len(character_sections):
@@ -24,7 +29,7 @@ class CharacterExtractor:
                 if character_name and content:
                     # Extract the update content (everything after the header)
                     # Remove the timestamp header if present
-                    update_content = re.sub(r'^###\s+.*?Update\s*\n', '', content, flags=re.MULTILINE)
+                    update_content = _UPDATE_HDR.sub('', content)
                     update_content = update_content.strip()
                     
                     if update_content:
@@ -36,21 +41,17 @@ class CharacterExtractor:
         # If no structured format found, try to extract character names from text
         if not updates:
             # Look for character names mentioned in the text
-            character_pattern = r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'
-            potential_characters = re.findall(character_pattern, extraction_text)
-            
             # Simple heuristic: if we find potential character names, create updates
             # This is a fallback - the AI should ideally follow the format
-            if potential_characters:
-                # Group by potential character name
-                seen = set()
-                for char_name in potential_characters:
-                    if char_name not in seen and len(char_name.split()) <= 3:
-                        seen.add(char_name)
-                        updates.append({
-                            'character': char_name,
-                            'update': extraction_text
-                        })
+            # dict.fromkeys dedups in one pass while keeping first-seen order
+            potential_characters = dict.fromkeys(
+                match.group(1) for match in _NAME_RE.finditer(extraction_text)
+                if len(match.group(1).split()) <= 3
+            )
+            updates = [
+                {'character': char_name, 'update': extraction_text}
+                for char_name in potential_characters
+            ]
         
         return updates
 
@@ -1,11 +1,113 @@
 import os
-from pathlib import Path
-from typing import Dict, Any, List
-import json
+import asyncio
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, List, Tuple, Optional, Sequence
+
+import aiofiles
+import numpy as np
+import orjson
+
+# Cloud-synced vaults (iCloud/OneDrive) can stall on reads; don't let one file hang a request
+READ_TIMEOUT_SECONDS = 10
+
+# Recently read context files (story bible, extractions, sliding window, Book 2), keyed by resolved
+# path and stamped with (mtime, size) so an edited file is re-read and replaces its old entry.
+# Bounded by total characters since a single Book 2 can run to megabytes.
+_CACHE_MAX_CHARS = 16_000_000
+_CACHE: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+_cache_chars = 0
+
+def _cache_get(path: str, mtime_ns: int, size: int) -> Optional[str]:
+    global _cache_chars
+    entry = _CACHE.pop(path, None)
+    if entry is None:
+        return None
+    if entry[:2] != (mtime_ns, size):
+        # Superseded version of the file
+        _cache_chars -= len(entry[2])
+        return None
+    _CACHE[path] = entry
+    return entry[2]
+
+def _cache_put(path: str, mtime_ns: int, size: int, text: str) -> None:
+    global _cache_chars
+    old = _CACHE.pop(path, None)
+    if old is not None:
+        _cache_chars -= len(old[2])
+    if len(text) > _CACHE_MAX_CHARS:
+        return
+    _CACHE[path] = (mtime_ns, size, text)
+    _cache_chars += len(text)
+    while _cache_chars > _CACHE_MAX_CHARS:
+        _, (_, _, evicted) = _CACHE.popitem(last=False)
+        _cache_chars -= len(evicted)
+
+# Smart Connections hits below this cosine similarity are noise rather than related notes
+SMART_CONNECTIONS_MIN_SCORE = 0.5
+# Upper bound on retrieved note text per prompt (~50k tokens); hits are added in rank order until it is spent
+SMART_CONNECTIONS_MAX_CHARS = 200_000
+# Related notes are read this many at a time, in rank order, so reading stops once the budget is spent
+_RELATED_NOTE_BATCH = 8
+
+def _vault_relative(path: str) -> str:
+    """Normalize a settings path to the vault-relative POSIX form Smart Connections uses as keys"""
+    return str(PurePosixPath(path.replace('\\', '/'))).lstrip('/')
+
+async def _read_text(file_path: Path) -> str:
+    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+        return await f.read()
+
+async def _read_bytes(file_path: Path) -> bytes:
+    async with aiofiles.open(file_path, 'rb') as f:
+        return await f.read()
+
+def _quantize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 quantization with one float32 scale per row"""
+    scales = np.abs(matrix).max(axis=-1) / 127.0
+    scales = np.where(scales == 0, 1.0, scales)
+    quantized = np.round(matrix / scales[..., None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def _build_embedding_index(raw: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse Smart Connections data into (note paths, int8 embedding matrix, row scales).
+    Entries look like {"Folder/Note.md#Heading": {"vec": [...]}, ...}, optionally
+    nested under "embeddings". Rows are L2-normalized before quantization so a
+    dequantized dot product against a normalized query yields cosine similarity;
+    int8 storage moves a quarter of the bytes of float32 through the matmul.
+    """
+    data = orjson.loads(raw)
+    entries = data.get('embeddings', data) if isinstance(data, dict) else {}
+    
+    paths = []
+    vectors = []
+    for key, entry in entries.items():
+        vec = entry.get('vec') if isinstance(entry, dict) else None
+        if not vec or (vectors and len(vec) != len(vectors[0])):
+            continue
+        # Block-level keys ("Note.md#Heading") map back to their note
+        paths.append(key.split('#', 1)[0])
+        vectors.append(vec)
+    
+    if not vectors:
+        # Settings-only or not-yet-indexed data; cached as an empty index
+        return np.empty(0, dtype=object), np.empty((0, 0), dtype=np.int8), np.empty(0, dtype=np.float32)
+    
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    quantized, scales = _quantize_rows(matrix)
+    return np.asarray(paths, dtype=object), quantized, scales
 
 class ContextAggregator:
     def __init__(self):
-        pass
+        # Smart Connections embedding index, rebuilt only when data.json's (path, mtime, size) changes
+        self._sc_cache_key: Optional[Tuple[str, int, int]] = None
+        self._sc_paths: np.ndarray = np.empty(0, dtype=object)
+        self._emb_matrix: np.ndarray = np.empty((0, 0), dtype=np.int8)
+        self._emb_scales: np.ndarray = np.empty(0, dtype=np.float32)
     
     async def get_chapter_context(
         self,
@@ -17,12 +119,24 @@ class ContextAggregator:
     ) -> Dict[str, Any]:
         vault = Path(vault_path)
         
+        smart_connections, book2, story_bible, extractions, sliding_window = await asyncio.gather(
+            self._get_smart_connections(
+                vault,
+                query_path=sliding_window_path,
+                exclude_paths=[book2_path, story_bible_path, extractions_path]
+            ),
+            self._read_file(vault / book2_path),
+            self._read_file(vault / story_bible_path),
+            self._read_file(vault / extractions_path),
+            self._read_file(vault / sliding_window_path)
+        )
+        
         return {
-            'smart_connections': await self._get_smart_connections(vault),
-            'book2': await self._read_file(vault / book2_path),
-            'story_bible': await self._read_file(vault / story_bible_path),
-            'extractions': await self._read_file(vault / extractions_path),
-            'sliding_window': await self._read_file(vault / sliding_window_path)
+            'smart_connections': smart_connections,
+            'book2': book2,
+            'story_bible': story_bible,
+            'extractions': extractions,
+            'sliding_window': sliding_window
         }
     
     async def get_micro_edit_context(
@@ -36,50 +150,160 @@ class ContextAggregator:
     ) -> Dict[str, Any]:
         vault = Path(vault_path)
         
+        sliding_window, story_bible, extractions, character_notes, smart_connections = await asyncio.gather(
+            self._read_file(vault / sliding_window_path),
+            self._read_file(vault / story_bible_path),
+            self._read_file(vault / extractions_path),
+            self._get_all_character_notes(vault / character_folder),
+            self._get_smart_connections(
+                vault,
+                limit=32,
+                query_path=sliding_window_path,
+                exclude_paths=[story_bible_path, extractions_path],
+                exclude_folders=[character_folder]
+            )
+        )
+        
         return {
-            'sliding_window': await self._read_file(vault / sliding_window_path),
-            'story_bible': await self._read_file(vault / story_bible_path),
-            'extractions': await self._read_file(vault / extractions_path),
-            'character_notes': await self._format_character_notes(await self._get_all_character_notes(vault / character_folder)),
-            'smart_connections': await self._get_smart_connections(vault, limit=32)
+            'sliding_window': sliding_window,
+            'story_bible': story_bible,
+            'extractions': extractions,
+            'character_notes': await self._format_character_notes(character_notes),
+            'smart_connections': smart_connections
         }
     
     async def get_character_notes(self, vault_path: str, character_folder: str) -> Dict[str, str]:
         vault = Path(vault_path)
         return await self._get_all_character_notes(vault / character_folder)
     
-    async def _read_file(self, file_path: Path) -> str:
+    async def _read_file(self, file_path: Path, cache: bool = True) -> str:
+        """
+        Read a vault file as text, or a bracketed error placeholder. Bulk reads
+        (character notes, retrieved notes) pass cache=False so they don't evict
+        the per-request context files from the LRU.
+        """
         try:
-            return file_path.read_text(encoding='utf-8')
+            if not cache:
+                return await asyncio.wait_for(_read_text(file_path), timeout=READ_TIMEOUT_SECONDS)
+            stat = os.stat(file_path)
+            path = str(file_path.resolve())
+            text = _cache_get(path, stat.st_mtime_ns, stat.st_size)
+            if text is None:
+                text = await asyncio.wait_for(_read_text(file_path), timeout=READ_TIMEOUT_SECONDS)
+                _cache_put(path, stat.st_mtime_ns, stat.st_size, text)
+            return text
+        except asyncio.TimeoutError:
+            return f"[Error reading file: timed out after {READ_TIMEOUT_SECONDS}s]"
         except Exception as e:
             return f"[Error reading file: {e}]"
     
-    async def _get_smart_connections(self, vault: Path, limit: int = 64) -> str:
-        # Try to read Smart Connections data
+    async def _get_smart_connections(
+        self,
+        vault: Path,
+        limit: int = 64,
+        query_path: Optional[str] = None,
+        exclude_paths: Sequence[str] = (),
+        exclude_folders: Sequence[str] = ()
+    ) -> str:
+        """
+        Return the notes most similar to query_path, using Smart Connections' stored embeddings.
+        Notes already in the prompt (exclude_paths, anything under exclude_folders) are skipped.
+        """
         sc_data_path = vault / '.obsidian' / 'plugins' / 'smart-connections' / 'data.json'
         if sc_data_path.exists():
             try:
-                # Parse Smart Connections embeddings and return similar notes
-                # This is a simplified version - actual implementation would need
-                # to understand Smart Connections' embedding format
-                data = json.loads(sc_data_path.read_text(encoding='utf-8'))
-                # For now, return a placeholder - full implementation would
-                # query embeddings and return actual similar note content
-                return "[Smart Connections data loaded - similarity search available]"
+                stat = os.stat(sc_data_path)
+                key = (str(sc_data_path.resolve()), stat.st_mtime_ns, stat.st_size)
+                if key != self._sc_cache_key:
+                    raw = await asyncio.wait_for(_read_bytes(sc_data_path), timeout=READ_TIMEOUT_SECONDS)
+                    # Parsing tens of MB of embeddings is CPU-bound; keep it off the event loop
+                    self._sc_paths, self._emb_matrix, self._emb_scales = await asyncio.to_thread(_build_embedding_index, raw)
+                    self._sc_cache_key = key
+                
+                if not self._emb_matrix.size:
+                    return "[Smart Connections: No embeddings found in data - let the plugin finish indexing your vault]"
+                
+                # The current note's own embeddings (all of its blocks) form the query
+                query_path = _vault_relative(query_path) if query_path else None
+                query_mask = self._sc_paths == query_path
+                if not query_path or not query_mask.any():
+                    return f"[Smart Connections: {query_path or 'Current note'} has not been indexed yet]"
+                query_vec = (self._emb_matrix[query_mask] * self._emb_scales[query_mask, None]).mean(axis=0)
+                query_vec /= np.linalg.norm(query_vec) or 1.0
+                query_int8, query_scale = _quantize_rows(query_vec)
+                
+                # Integer dot products accumulate in int32 (einsum casts in buffered chunks), then dequantize
+                scores = np.einsum('ij,j->i', self._emb_matrix, query_int8, dtype=np.int32) * (self._emb_scales * query_scale)
+                excluded = {_vault_relative(path) for path in exclude_paths}
+                folder_prefixes = tuple(_vault_relative(folder) + '/' for folder in exclude_folders)
+                excluded_mask = query_mask | np.fromiter(
+                    (path in excluded or path.startswith(folder_prefixes) for path in self._sc_paths),
+                    dtype=bool,
+                    count=len(self._sc_paths)
+                )
+                scores[excluded_mask | (scores < SMART_CONNECTIONS_MIN_SCORE)] = -np.inf
+                k = min(limit, int(np.isfinite(scores).sum()))
+                if k <= 0:
+                    return "[Smart Connections: No closely related notes found]"
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                
+                # Several blocks of one note can rank; keep each note once at its best score
+                best_scores: Dict[str, float] = {}
+                for idx in top:
+                    best_scores.setdefault(self._sc_paths[idx], float(scores[idx]))
+                ranked = list(best_scores.items())
+                
+                # Add notes in rank order while they fit the character budget; an
+                # oversized or unreadable note is skipped rather than ending the list
+                formatted = []
+                remaining = SMART_CONNECTIONS_MAX_CHARS
+                for start in range(0, len(ranked), _RELATED_NOTE_BATCH):
+                    if remaining <= 0:
+                        break
+                    batch = ranked[start:start + _RELATED_NOTE_BATCH]
+                    contents = await asyncio.gather(*(self._read_related_note(vault / note_path, remaining) for note_path, _ in batch))
+                    for (note_path, score), content in zip(batch, contents):
+                        if content is None or len(content) > remaining:
+                            continue
+                        remaining -= len(content)
+                        formatted.append(f"## {note_path} (similarity {score:.2f})\n{content}\n")
+                if not formatted:
+                    return "[Smart Connections: No readable related notes fit the context budget]"
+                return "\n---\n\n".join(formatted)
+            except asyncio.TimeoutError:
+                return f"[Smart Connections: Error loading data - timed out after {READ_TIMEOUT_SECONDS}s]"
             except Exception as e:
                 return f"[Smart Connections: Error loading data - {e}]"
         return "[Smart Connections: No data found - ensure plugin is installed and has indexed your vault]"
     
+    async def _read_related_note(self, file_path: Path, max_chars: int) -> Optional[str]:
+        """Read a retrieved note, or None if it is unreadable (e.g. deleted since indexing) or too large"""
+        try:
+            # A UTF-8 character is at most 4 bytes, so a file over 4x the budget in bytes can't fit
+            if os.stat(file_path).st_size > 4 * max_chars:
+                return None
+            content = await asyncio.wait_for(_read_text(file_path), timeout=READ_TIMEOUT_SECONDS)
+        except Exception:
+            return None
+        return content if len(content) <= max_chars else None
+    
     async def _get_all_character_notes(self, character_folder: Path) -> Dict[str, str]:
-        notes = {}
         if not character_folder.exists():
-            return notes
+            return {}
         
-        for file_path in character_folder.glob('*.md'):
-            character_name = file_path.stem
-            notes[character_name] = await self._read_file(file_path)
-        
-        return notes
+        # scandir exposes the file type from the directory listing, avoiding glob's per-entry pattern matching
+        try:
+            with os.scandir(character_folder) as entries:
+                md_entries = [
+                    entry for entry in entries
+                    if entry.name.endswith('.md') and entry.is_file()
+                ]
+        except OSError:
+            # Not a directory or unreadable; glob yielded nothing here, so carry on without notes
+            return {}
+        contents = await asyncio.gather(*(self._read_file(Path(entry.path), cache=False) for entry in md_entries))
+        return dict(zip((entry.name[:-3] for entry in md_entries), contents))
     
     async def _format_character_notes(self, character_notes: Dict[str, str]) -> str:
         """Format character notes for inclusion in prompts"""
@@ -1,53 +1,32 @@
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple, Tuple
 
-class PromptEngine:
-    def build_chapter_prompt(self, context: Dict[str, Any], instructions: str, word_count: int) -> str:
-        return f"""SYSTEM INSTRUCTION FOR AI (1M CONTEXT):
-
-You are working on a multi-book narrative. Interpret the following file contents as directed:
-
--------------------------------------------------------------
-BOOK 1 — CANON (LOADED VIA SMART CONNECTIONS)
--------------------------------------------------------------
-{context.get('smart_connections', '')}
-
-Use these excerpts to maintain continuity, tone, and world consistency.
-Do NOT contradict Book 1 canon.
+class PromptParts(NamedTuple):
+    # Static instructions plus slow-changing vault context, sent as the cacheable system prompt.
+    # Split into blocks at cache breakpoints, most stable first.
+    system: Tuple[str, ...]
+    # Per-request context and the closing instruction
+    user: str
 
--------------------------------------------------------------
-BOOK 2 — ACTIVE MANUSCRIPT (CONTINUE THIS)
--------------------------------------------------------------
-{context.get('book2', '')}
+_RULE = "-------------------------------------------------------------"
 
-Continue this manuscript.
-
--------------------------------------------------------------
-STORY BIBLE + EXTRACTIONS — WORLD + RULESET
--------------------------------------------------------------
-{context.get('story_bible', '')}
-{context.get('extractions', '')}
-
-These define rules of the world, character arcs, faction details, timelines, technology, tone, themes, motifs, and relationship structure.
-These override Book 2 in cases of conflict.
-
--------------------------------------------------------------
-SLIDING WINDOW — IMMEDIATE CONTEXT
--------------------------------------------------------------
-{context.get('sliding_window', '')}
+def _section(title: str) -> str:
+    return f"{_RULE}\n{title}\n{_RULE}\n"
 
-Continue directly from this.
+def _literal(text: str) -> str:
+    """Escape braces so static text can be embedded in a format template"""
+    return text.replace("{", "{{").replace("}", "}}")
 
--------------------------------------------------------------
-AUTHOR INSTRUCTIONS
--------------------------------------------------------------
-{instructions}
+class _Slots(dict):
+    """format_map mapping where absent context keys render as empty strings"""
+    def __missing__(self, key: str) -> str:
+        return ''
 
-Author provides summary of events to be written or directions (like a director) or both.
+class PromptEngine:
+    # Immutable instructions come first so every request shares the same long
+    # prefix (provider prompt caching); per-request context is appended after it.
+    _CHAPTER_PREFIX = """SYSTEM INSTRUCTION FOR AI (1M CONTEXT):
 
--------------------------------------------------------------
-TARGET WORD COUNT
--------------------------------------------------------------
-{word_count} words
+You are working on a multi-book narrative. Interpret the following file contents as directed.
 
 -------------------------------------------------------------
 SUMMARY OF YOUR ROLE
@@ -58,56 +37,26 @@ SUMMARY OF YOUR ROLE
 - Sliding Window = direct lead-in
 - Instructions = style constraints
 
-Continue writing Book 2 using all provided context.
-Maintain perfect continuity and match the author's voice."""
-
-    def build_micro_edit_prompt(self, selected_text: str, director_notes: str, context: Dict[str, Any]) -> str:
-        return f"""SYSTEM INSTRUCTION FOR AI (1M CONTEXT):
-
-You are a line editor working on a specific passage that needs refinement.
-
--------------------------------------------------------------
-SELECTED PASSAGE TO EDIT
--------------------------------------------------------------
-{selected_text}
-
-This is the passage the author wants revised.
-
 -------------------------------------------------------------
-AUTHOR GRIEVANCES + DIRECTIVES
+HOW TO USE EACH SECTION
 -------------------------------------------------------------
-{director_notes}
+- STORY BIBLE + EXTRACTIONS define rules of the world, character arcs, faction details, timelines, technology, tone, themes, motifs, and relationship structure.
+  These override Book 2 in cases of conflict.
+- BOOK 1 — CANON excerpts maintain continuity, tone, and world consistency.
+  Do NOT contradict Book 1 canon.
+- BOOK 2 — ACTIVE MANUSCRIPT is the manuscript you continue.
+- SLIDING WINDOW is the immediate context. Continue directly from this.
+- AUTHOR INSTRUCTIONS provide a summary of events to be written or directions (like a director) or both.
+"""
 
-The author's specific concerns, plot disagreements, style issues, or desired changes for this passage.
+    _CHAPTER_SUFFIX = """
 
--------------------------------------------------------------
-IMMEDIATE CONTEXT — SLIDING WINDOW
--------------------------------------------------------------
-{context.get('sliding_window', '')}
-
-This provides immediate narrative context around the selected passage.
-
--------------------------------------------------------------
-STORY BIBLE + EXTRACTIONS — CANON CONSTRAINTS
--------------------------------------------------------------
-{context.get('story_bible', '')}
-{context.get('extractions', '')}
-
-Maintain consistency with world rules, character arcs, and established canon.
-
--------------------------------------------------------------
-CHARACTER NOTES — VOICE + CONTINUITY
--------------------------------------------------------------
-{context.get('character_notes', '')}
-
-Use these to maintain character voice, relationships, and arc progression.
+Continue writing Book 2 using all provided context.
+Maintain perfect continuity and match the author's voice."""
 
--------------------------------------------------------------
-SMART CONNECTIONS — STYLE ECHOES
--------------------------------------------------------------
-{context.get('smart_connections', '')}
+    _MICRO_EDIT_PREFIX = """SYSTEM INSTRUCTION FOR AI (1M CONTEXT):
 
-Similar passages for tone and style reference.
+You are a line editor working on a specific passage that needs refinement.
 
 -------------------------------------------------------------
 YOUR TASK
@@ -119,35 +68,24 @@ Generate a SINGLE refined alternative to the selected passage that:
 4. Matches the author's writing style
 5. Flows seamlessly when inserted into the manuscript
 
-Output ONLY the revised passage, ready to be copy-pasted into the manuscript."""
-
-    def build_character_extraction_prompt(self, selected_text: str, character_notes: Dict[str, str], story_bible: str) -> str:
-        character_notes_text = "\n\n".join([f"## {name}\n{content}" for name, content in character_notes.items()])
-        
-        return f"""SYSTEM INSTRUCTION FOR AI:
-
-You are extracting character information from a narrative passage.
-
 -------------------------------------------------------------
-PASSAGE TO ANALYZE
+HOW TO USE EACH SECTION
 -------------------------------------------------------------
-{selected_text}
-
-Extract character-relevant information from this passage.
+- STORY BIBLE + EXTRACTIONS: maintain consistency with world rules, character arcs, and established canon.
+- CHARACTER NOTES: maintain character voice, relationships, and arc progression.
+- SMART CONNECTIONS: similar passages for tone and style reference.
+- SLIDING WINDOW: immediate narrative context around the selected passage.
+- SELECTED PASSAGE: the passage the author wants revised.
+- AUTHOR GRIEVANCES + DIRECTIVES: the author's specific concerns, plot disagreements, style issues, or desired changes for this passage.
+"""
 
--------------------------------------------------------------
-EXISTING CHARACTER NOTES (IF ANY)
--------------------------------------------------------------
-{character_notes_text}
+    _MICRO_EDIT_SUFFIX = """
 
-Current state of character files. Update these with new information.
+Output ONLY the revised passage, ready to be copy-pasted into the manuscript."""
 
--------------------------------------------------------------
-STORY BIBLE — CONTEXT
--------------------------------------------------------------
-{story_bible}
+    _EXTRACTION_PREFIX = """SYSTEM INSTRUCTION FOR AI:
 
-Use for world context and relationship structures.
+You are extracting character information from a narrative passage.
 
 -------------------------------------------------------------
 EXTRACTION TASK
@@ -188,9 +126,9 @@ Analyze the passage and extract:
 
 Output in the following format for each character found:
 
-## {{CharacterName}}
+## {CharacterName}
 
-### {{timestamp}} - Update
+### {timestamp} - Update
 
 **Voice Evidence:**
 [quoted dialogue or narration with page/chapter reference]
@@ -199,7 +137,7 @@ Output in the following format for each character found:
 - [trait]: [evidence]
 
 **Relationships:**
-- **{{OtherCharacter}}**: [relationship change/evidence]
+- **{OtherCharacter}**: [relationship change/evidence]
 
 **Arc Progression:**
 [what changed in this passage]
@@ -209,5 +147,99 @@ Output in the following format for each character found:
 
 ---
 
-This will be appended to the character's note file with timestamp."""
-
+This will be appended to the character's note file with timestamp.
+
+-------------------------------------------------------------
+HOW TO USE EACH SECTION
+-------------------------------------------------------------
+- STORY BIBLE: use for world context and relationship structures.
+- EXISTING CHARACTER NOTES: current state of character files. Update these with new information.
+- PASSAGE TO ANALYZE: extract character-relevant information from this passage.
+"""
+
+    _EXTRACTION_SUFFIX = """
+
+Extract the character information from the passage above using the format described."""
+
+    # Templates are assembled once at import; each build is a single format_map
+    # pass. Sections are ordered from most to least stable across requests.
+    _CHAPTER_SYSTEM_TEMPLATE = (
+        _literal(_CHAPTER_PREFIX) + "\n"
+        + _literal(_section("STORY BIBLE + EXTRACTIONS — WORLD + RULESET"))
+        + "{story_bible}\n{extractions}\n\n"
+    )
+    # Book 2 changes after every chapter; its own block keeps the prefix above cacheable
+    _CHAPTER_BOOK2_TEMPLATE = (
+        _literal(_section("BOOK 2 — ACTIVE MANUSCRIPT (CONTINUE THIS)"))
+        + "{book2}"
+    )
+    _CHAPTER_USER_TEMPLATE = (
+        _literal(_section("BOOK 1 — CANON (LOADED VIA SMART CONNECTIONS)"))
+        + "{smart_connections}\n\n"
+        + _literal(_section("SLIDING WINDOW — IMMEDIATE CONTEXT"))
+        + "{sliding_window}\n\n"
+        + _literal(_section("AUTHOR INSTRUCTIONS"))
+        + "{instructions}\n\n"
+        + _literal(_section("TARGET WORD COUNT"))
+        + "{word_count} words"
+        + _literal(_CHAPTER_SUFFIX)
+    )
+
+    _MICRO_EDIT_SYSTEM_TEMPLATE = (
+        _literal(_MICRO_EDIT_PREFIX) + "\n"
+        + _literal(_section("STORY BIBLE + EXTRACTIONS — CANON CONSTRAINTS"))
+        + "{story_bible}\n{extractions}\n\n"
+        + _literal(_section("CHARACTER NOTES — VOICE + CONTINUITY"))
+        + "{character_notes}"
+    )
+    _MICRO_EDIT_USER_TEMPLATE = (
+        _literal(_section("SMART CONNECTIONS — STYLE ECHOES"))
+        + "{smart_connections}\n\n"
+        + _literal(_section("IMMEDIATE CONTEXT — SLIDING WINDOW"))
+        + "{sliding_window}\n\n"
+        + _literal(_section("SELECTED PASSAGE TO EDIT"))
+        + "{selected_text}\n\n"
+        + _literal(_section("AUTHOR GRIEVANCES + DIRECTIVES"))
+        + "{director_notes}"
+        + _literal(_MICRO_EDIT_SUFFIX)
+    )
+
+    _EXTRACTION_SYSTEM_TEMPLATE = (
+        _literal(_EXTRACTION_PREFIX) + "\n"
+        + _literal(_section("STORY BIBLE — CONTEXT"))
+        + "{story_bible}\n\n"
+        + _literal(_section("EXISTING CHARACTER NOTES (IF ANY)"))
+        + "{character_notes_text}"
+    )
+    _EXTRACTION_USER_TEMPLATE = (
+        _literal(_section("PASSAGE TO ANALYZE"))
+        + "{selected_text}"
+        + _literal(_EXTRACTION_SUFFIX)
+    )
+
+    @staticmethod
+    def build_chapter_prompt(context: Dict[str, Any], instructions: str, word_count: int) -> PromptParts:
+        slots = _Slots(context, instructions=instructions, word_count=word_count)
+        return PromptParts(
+            (
+                PromptEngine._CHAPTER_SYSTEM_TEMPLATE.format_map(slots),
+                PromptEngine._CHAPTER_BOOK2_TEMPLATE.format_map(slots)
+            ),
+            PromptEngine._CHAPTER_USER_TEMPLATE.format_map(slots)
+        )
+
+    @staticmethod
+    def build_micro_edit_prompt(selected_text: str, director_notes: str, context: Dict[str, Any]) -> PromptParts:
+        slots = _Slots(context, selected_text=selected_text, director_notes=director_notes)
+        return PromptParts(
+            (PromptEngine._MICRO_EDIT_SYSTEM_TEMPLATE.format_map(slots),),
+            PromptEngine._MICRO_EDIT_USER_TEMPLATE.format_map(slots)
+        )
+
+    @staticmethod
+    def build_character_extraction_prompt(selected_text: str, character_notes_text: str, story_bible: str) -> PromptParts:
+        slots = _Slots(selected_text=selected_text, character_notes_text=character_notes_text, story_bible=story_bible)
+        return PromptParts(
+            (PromptEngine._EXTRACTION_SYSTEM_TEMPLATE.format_map(slots),),
+            PromptEngine._EXTRACTION_USER_TEMPLATE.format_map(slots)
+        )